@@ -1,15 +1,23 @@
+import os
 import streamlit as st
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
-import sqlite3
-from utils import InsightGenerator, AnalysisResponse
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from utils import InsightGenerator, AnalysisResponse, ReadPool
 
-# Initialize generator
-generator = InsightGenerator()
+# Query engine for the analysis SQL: "sqlite" (default) or "duckdb"
+SQL_ENGINE = os.getenv("SQL_ENGINE", "sqlite").lower()
+
+# Number of queries that may run concurrently
+SQL_WORKERS = os.cpu_count() or 1
 
-# Connect to SQLite database
-conn = sqlite3.connect("data_insights.db")
+# Read-side connection settings; the pool is read-only, so journal_mode and the
+# other write settings belong to create_db.py and insert_data.py
+SQLITE_PRAGMAS = (
+    "busy_timeout=5000",
+    "cache_size=-20000",
+    "temp_store=memory",
+)
 
 # Sample table metadata
 table_metadata = {
@@ -17,6 +25,169 @@ table_metadata = {
     "product_info": ["product_id", "product_name", "category", "price"],
 }
 
+
+@st.cache_resource
+def get_generator() -> InsightGenerator:
+    """Builds the insight generator once and reuses it across reruns."""
+    return InsightGenerator()
+
+
+@st.cache_resource
+def get_pool() -> ReadPool:
+    """Loads the database into memory once and shares a read pool across reruns."""
+    return ReadPool("data_insights.db", SQL_WORKERS, SQLITE_PRAGMAS, in_memory=True)
+
+
+@st.cache_resource
+def get_duckdb(tables: tuple):
+    """Opens an in-process DuckDB connection with a view over each table's CSV."""
+    import duckdb
+
+    con = duckdb.connect()
+    con.execute(f"PRAGMA threads={SQL_WORKERS}")
+    for table in tables:
+        con.execute(
+            f"CREATE VIEW {table} AS SELECT * FROM read_csv_auto('{table}.csv')"
+        )
+    return con
+
+
+# Initialize generator
+generator = get_generator()
+
+
+@st.cache_data(ttl=600, show_spinner=False)
+def run_sql(sql: str) -> pd.DataFrame:
+    """Executes a query against the configured engine, cached per SQL string."""
+    if SQL_ENGINE == "duckdb":
+        # Each thread needs its own cursor on the shared database
+        with get_duckdb(tuple(table_metadata)).cursor() as cur:
+            return cur.execute(sql).df()
+    with get_pool().acquire() as c:
+        return pd.read_sql_query(sql, c, dtype_backend="pyarrow")
+
+
+def strip_table_prefix(name: str) -> str:
+    """Drops a leading table qualifier, e.g. "sales_data.region" -> "region"."""
+    return name.rsplit(".", 1)[-1]
+
+
+@st.cache_data(show_spinner=False)
+def correlation_long(df: pd.DataFrame) -> pd.DataFrame:
+    """Computes the correlation matrix in long form, cached per DataFrame contents."""
+    return df.corr(numeric_only=True).reset_index().melt("index", var_name="variable")
+
+
+def render_message(message: dict):
+    """Renders a chat message along with any attached visualizations."""
+    with st.chat_message(message["role"]):
+        st.markdown(message["content"])
+        for viz in message.get("visualizations", []):
+            if (
+                viz["type"].lower() == "line_chart"
+                and viz["x_label"]
+                and viz["y_label"]
+            ):
+                st.line_chart(viz["data"].set_index(viz["x_label"]), y=viz["y_label"])
+            elif (
+                viz["type"].lower() == "bar_chart" and viz["x_label"] and viz["y_label"]
+            ):
+                st.bar_chart(viz["data"].set_index(viz["x_label"]), y=viz["y_label"])
+            elif viz["type"].lower() == "heatmap":
+                # Deferred like streamlit's own bar and line charts, so altair is loaded
+                # by the first chart rendered rather than on the app's first page load
+                import altair as alt
+
+                chart = (
+                    alt.Chart(correlation_long(viz["data"]))
+                    .mark_rect()
+                    .encode(x="index:O", y="variable:O", color="value:Q")
+                )
+                st.altair_chart(chart, use_container_width=True)
+
+
+def sql_executor() -> ThreadPoolExecutor:
+    """Thread pool for one query's SQL reads; its workers carry this run's context."""
+    return ThreadPoolExecutor(
+        max_workers=SQL_WORKERS,
+        initializer=add_script_run_ctx,
+        initargs=(None, get_script_run_ctx()),
+    )
+
+
+def build_insights_list(
+    response: AnalysisResponse, executor: ThreadPoolExecutor
+) -> list:
+    """Turns a generator response into displayable insights, running their SQL."""
+    insights_list = []
+
+    if response.response_type == "info":
+        insights_list.append(
+            {
+                "insight": response.answer,
+                "visualizations": [],
+            }
+        )
+    elif response.response_type == "analysis":
+        # Overlap the insights' SQL reads across the connection pool
+        futures = [
+            executor.submit(run_sql, insight.sql_query) for insight in response.insights
+        ]
+        for insight, future in zip(response.insights, futures):
+            try:
+                # Execute SQL query
+                df = future.result()
+
+                # Clean column names by removing table prefixes
+                df.columns = df.columns.map(strip_table_prefix)
+
+                # Get clean metric names
+                x_label = strip_table_prefix(insight.metrics[0])
+                y_label = (
+                    strip_table_prefix(insight.metrics[1])
+                    if len(insight.metrics) > 1
+                    else None
+                )
+
+                insights_list.append(
+                    {
+                        "insight": insight.insight,
+                        "visualizations": [
+                            {
+                                "type": insight.visualization,
+                                "data": df,
+                                "x_label": x_label,
+                                "y_label": y_label,
+                            }
+                        ],
+                        "sql_query": insight.sql_query,
+                    }
+                )
+            except Exception as e:
+                insights_list.append(
+                    {
+                        "insight": f"❌ Error processing visualization: {str(e)}",
+                        "visualizations": [],
+                    }
+                )
+    elif response.response_type == "error":
+        insights_list.append(
+            {
+                "insight": f"❌ {response.answer}",
+                "visualizations": [],
+            }
+        )
+    else:
+        insights_list.append(
+            {
+                "insight": "❌ Error: " + response.answer,
+                "visualizations": [],
+            }
+        )
+
+    return insights_list
+
+
 st.title("AI-Driven Business Insights")
 st.write("*Ask questions about your data and get insights!*")
 
@@ -27,123 +198,47 @@ suggested_prompts = [
     "Which product category generates highest revenue?",
 ]
 
-st.session_state.messages = []
+if "messages" not in st.session_state:
+    st.session_state.messages = []
 if "selected_prompt" not in st.session_state:
     st.session_state.selected_prompt = None
 
-cols = st.columns(len(suggested_prompts))
-for i, prompt in enumerate(suggested_prompts):
-    if cols[i].button(prompt, key=f"prompt_{i}"):
-        st.session_state.selected_prompt = prompt
-
-chat_input = st.chat_input("Enter your query:", key="chat_input")
-query = st.session_state.selected_prompt or chat_input
 
-if query:
-    st.session_state.selected_prompt = None
-    st.session_state.messages.append({"role": "user", "content": query})
-
-    with st.status("🤖 Analyzing your query...", expanded=True) as status:
-        response: AnalysisResponse = generator.generate_insights(query, table_metadata)
-        insights_list = []
-
-        if response.response_type == "info":
-            insights_list.append(
-                {
-                    "insight": response.answer,
-                    "visualizations": [],
-                }
-            )
-        elif response.response_type == "analysis":
-            for insight in response.insights:
-                try:
-                    # Execute SQL query
-                    df = pd.read_sql_query(insight.sql_query, conn)
-
-                    # Clean column names by removing table prefixes
-                    df.columns = [
-                        col.split(".")[-1] if "." in col else col for col in df.columns
-                    ]
-
-                    # Get clean metric names
-                    x_label = (
-                        insight.metrics[0].split(".")[-1]
-                        if insight.metrics and "." in insight.metrics[0]
-                        else insight.metrics[0]
-                    )
-                    y_label = (
-                        insight.metrics[1].split(".")[-1]
-                        if len(insight.metrics) > 1 and "." in insight.metrics[1]
-                        else insight.metrics[1]
-                        if len(insight.metrics) > 1
-                        else None
-                    )
-
-                    insights_list.append(
-                        {
-                            "insight": insight.insight,
-                            "visualizations": [
-                                {
-                                    "type": insight.visualization,
-                                    "data": df,
-                                    "x_label": x_label,
-                                    "y_label": y_label,
-                                }
-                            ],
-                            "sql_query": insight.sql_query,
-                        }
-                    )
-                except Exception as e:
-                    insights_list.append(
-                        {
-                            "insight": f"❌ Error processing visualization: {str(e)}",
-                            "visualizations": [],
+@st.fragment
+def handle_query():
+    """Chat section; reruns on its own so the rest of the page stays untouched."""
+    cols = st.columns(len(suggested_prompts))
+    for i, prompt in enumerate(suggested_prompts):
+        if cols[i].button(prompt, key=f"prompt_{i}"):
+            st.session_state.selected_prompt = prompt
+
+    chat_input = st.chat_input("Enter your query:", key="chat_input")
+    query = st.session_state.selected_prompt or chat_input
+
+    # Replay earlier turns without re-querying Gemini or SQLite
+    for message in st.session_state.messages:
+        render_message(message)
+
+    if query:
+        st.session_state.selected_prompt = None
+        user_message = {"role": "user", "content": query}
+        render_message(user_message)
+        st.session_state.messages.append(user_message)
+
+        with sql_executor() as executor:
+            with st.status("🤖 Analyzing your query...", expanded=True) as status:
+                for response in generator.stream_insights(query, table_metadata):
+                    for item in build_insights_list(response, executor):
+                        message = {
+                            "role": "assistant",
+                            "content": f"**Insight:** {item['insight']}\n\n",
+                            "visualizations": item["visualizations"],
                         }
-                    )
-        elif response.response_type == "error":
-            insights_list.append(
-                {
-                    "insight": f"❌ {response.answer}",
-                    "visualizations": [],
-                }
-            )
-        else:
-            insights_list.append(
-                {
-                    "insight": "❌ Error: " + response.answer,
-                    "visualizations": [],
-                }
-            )
-
-        for item in insights_list:
-            message = {
-                "role": "assistant",
-                "content": f"**Insight:** {item['insight']}\n\n",
-                "visualizations": item["visualizations"],
-            }
 
-            with st.chat_message(message["role"]):
-                st.markdown(message["content"])
-                for viz in message["visualizations"]:
-                    if (
-                        viz["type"].lower() == "line_chart"
-                        and viz["x_label"]
-                        and viz["y_label"]
-                    ):
-                        st.line_chart(
-                            viz["data"].set_index(viz["x_label"]), y=viz["y_label"]
-                        )
-                    elif (
-                        viz["type"].lower() == "bar_chart"
-                        and viz["x_label"]
-                        and viz["y_label"]
-                    ):
-                        st.bar_chart(
-                            viz["data"].set_index(viz["x_label"]), y=viz["y_label"]
-                        )
-                    elif viz["type"].lower() == "heatmap":
-                        fig, ax = plt.subplots()
-                        sns.heatmap(viz["data"].corr(), ax=ax)
-                        st.pyplot(fig)
-
-conn.close()
+                        # Store only messages that rendered, so a failing one cannot
+                        # break every later replay of the history
+                        render_message(message)
+                        st.session_state.messages.append(message)
+
+
+handle_query()
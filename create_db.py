@@ -5,6 +5,14 @@ import pandas as pd
 conn = sqlite3.connect('data_insights.db')
 cursor = conn.cursor()
 
+# Tune SQLite for a read-heavy workload; WAL mode persists in the database file
+cursor.execute('PRAGMA journal_mode=WAL')
+cursor.execute('PRAGMA synchronous=NORMAL')
+cursor.execute('PRAGMA busy_timeout=5000')
+cursor.execute('PRAGMA cache_size=-20000')
+cursor.execute('PRAGMA temp_store=memory')
+cursor.execute('PRAGMA foreign_keys=ON')
+
 # Drop tables if they exist
 cursor.execute('DROP TABLE IF EXISTS sales_data')
 cursor.execute('DROP TABLE IF EXISTS product_info')
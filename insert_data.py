@@ -3,19 +3,34 @@ import pandas as pd
 
 # Connect to SQLite database
 conn = sqlite3.connect('data_insights.db')
+conn.execute('PRAGMA journal_mode=WAL')
+conn.execute('PRAGMA synchronous=NORMAL')
 
-# Load data from CSV files
-sales_data = pd.read_csv('sales_data.csv')
-product_info = pd.read_csv('product_info.csv')
+# Bind missing values from Arrow-backed columns as NULL
+sqlite3.register_adapter(type(pd.NA), lambda _: None)
 
-# Insert data into sales_data table
-sales_data.to_sql('sales_data', conn, if_exists='append', index=False)
+# Load data from CSV files with the multithreaded Arrow reader;
+# sale_date stays text to match the sales_data schema
+sales_data = pd.read_csv(
+    'sales_data.csv', engine='pyarrow', dtype_backend='pyarrow',
+    dtype={'sale_date': 'string[pyarrow]'}
+)
+product_info = pd.read_csv(
+    'product_info.csv', engine='pyarrow', dtype_backend='pyarrow'
+)
 
-# Insert data into product_info table
-product_info.to_sql('product_info', conn, if_exists='append', index=False)
+# Insert both tables in a single transaction with one executemany per table
+conn.execute('BEGIN IMMEDIATE')
+for table, df in (('sales_data', sales_data), ('product_info', product_info)):
+    columns = ', '.join(df.columns)
+    placeholders = ', '.join('?' * len(df.columns))
+    conn.executemany(
+        f'INSERT INTO {table} ({columns}) VALUES ({placeholders})',
+        df.itertuples(index=False, name=None)
+    )
 
 # Commit changes and close the connection
 conn.commit()
 conn.close()
 
-print("Data inserted successfully.")
\ No newline at end of file
+print("Data inserted successfully.")
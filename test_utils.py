@@ -0,0 +1,173 @@
+import json
+
+import google.generativeai as genai
+
+from utils import InsightGenerator, ReplyCache, _InsightScanner
+
+
+def insight(name):
+    return {
+        "insight": name,
+        "business_value": "b",
+        "sql_query": "SELECT t.a AS a FROM t",
+        "visualization": "bar_chart",
+        "metrics": ["a", "b"],
+    }
+
+
+def feed_in_chunks(scanner, text, size):
+    """Feeds text in fixed-size chunks, returning the insights and kept text."""
+    found, kept = [], []
+    for i in range(0, len(text), size):
+        chunk = text[i : i + size]
+        found += scanner.feed(chunk)
+        kept.append(chunk[: scanner.end] if scanner.complete else chunk)
+        if scanner.complete:
+            break
+    return found, "".join(kept)
+
+
+def test_fenced_analysis_completes_at_closing_brace():
+    doc = json.dumps(
+        {"response_type": "analysis", "insights": [insight("one"), insight("two")]}
+    )
+    for size in (1, 3, 7, len(doc) + 20):
+        scanner = _InsightScanner()
+        found, kept = feed_in_chunks(scanner, "```json\n" + doc + "\n```\n", size)
+        assert [json.loads(f)["insight"] for f in found] == ["one", "two"]
+        assert scanner.complete
+        assert kept == "```json\n" + doc
+
+
+def test_brackets_inside_strings_are_ignored():
+    doc = json.dumps({"response_type": "info", "answer": 'a {b} [c] "d" \\ }'})
+    scanner = _InsightScanner()
+    found, kept = feed_in_chunks(scanner, "  " + doc + "  ", 4)
+    assert found == []
+    assert scanner.complete
+    assert kept == "  " + doc
+
+
+def test_prose_with_brackets_never_completes():
+    for reply in (
+        "I am unable to generate [an] insight for this question",
+        "Sure (see {note}): ```json\n" + json.dumps({"response_type": "info"}),
+        "``json\n{}",
+        "```jsonx{}",
+    ):
+        scanner = _InsightScanner()
+        found, kept = feed_in_chunks(scanner, reply, 5)
+        assert found == []
+        assert not scanner.complete
+        assert kept == reply
+
+
+def test_reply_cache_evicts_oldest_and_expires():
+    cache = ReplyCache(maxsize=2)
+    cache.put(("a", "m"), "1")
+    cache.put(("b", "m"), "2")
+    assert cache.get(("a", "m")) == "1"
+    cache.put(("c", "m"), "3")
+    assert cache.get(("b", "m")) is None
+    assert cache.get(("a", "m")) == "1"
+
+    expired = ReplyCache(ttl=0)
+    expired.put(("a", "m"), "1")
+    assert expired.get(("a", "m")) is None
+
+
+def test_non_object_replies_are_errors():
+    for reply in ("[1, 2]", '"text"', "3", '```json\n"text"\n```'):
+        response = InsightGenerator.parse_response(reply)
+        assert response.response_type == "error"
+
+
+def test_cleanup_keeps_non_ascii_text_intact():
+    answer = "a\u00a0\u00a0b, café,été SELECTÉ"
+    reply = (
+        "```json\n"
+        + json.dumps({"response_type": "info", "answer": answer}, ensure_ascii=False)
+        + "\n```"
+    )
+    response = InsightGenerator.parse_response(reply)
+    assert response.answer == "a b, café, été SELECTÉ"
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+def stream(monkeypatch, reply, size=7):
+    """Runs stream_insights against a stubbed Gemini that sends reply in chunks."""
+
+    def generate_content(self, prompt, stream=False):
+        return [_Chunk(reply[i : i + size]) for i in range(0, len(reply), size)]
+
+    monkeypatch.setattr(genai.GenerativeModel, "generate_content", generate_content)
+    return [
+        (r.response_type, [i.insight for i in r.insights or []], r.answer)
+        for r in InsightGenerator().stream_insights("q", {"t": ["a", "b"]})
+    ]
+
+
+def test_stream_yields_each_insight_as_it_arrives(monkeypatch):
+    doc = json.dumps(
+        {"response_type": "analysis", "insights": [insight("one"), insight("two")]}
+    )
+    assert stream(monkeypatch, "```json\n" + doc + "\n```") == [
+        ("analysis", ["one"], None),
+        ("analysis", ["two"], None),
+    ]
+
+
+def test_stream_cleans_each_insight(monkeypatch):
+    second = json.dumps(insight("two")).replace(
+        '"SELECT t.a AS a FROM t"', '"SELECT t.a AS a " + "FROM t"'
+    )
+    reply = (
+        '```json\n{"response_type": "analysis", "insights": ['
+        + json.dumps(insight("one"))
+        + ", "
+        + second
+        + "]}\n```"
+    )
+    assert stream(monkeypatch, reply) == [
+        ("analysis", ["one"], None),
+        ("analysis", ["two"], None),
+    ]
+
+
+def test_stream_hides_a_failed_full_parse_after_streaming(monkeypatch):
+    reply = (
+        '{"response_type": "analysis", "insights": ['
+        + json.dumps(insight("one"))
+        + ', {"insight": '
+    )
+    assert stream(monkeypatch, reply) == [("analysis", ["one"], None)]
+
+
+def test_stream_reports_an_insight_that_does_not_parse(monkeypatch):
+    reply = (
+        '{"response_type": "analysis", "insights": ['
+        + json.dumps(insight("one"))
+        + ', {"insight": "two"}]}'
+    )
+    first, *rest = stream(monkeypatch, reply)
+    assert first == ("analysis", ["one"], None)
+    assert [r[0] for r in rest] == ["error"]
+
+
+def test_stream_info_reply(monkeypatch):
+    reply = json.dumps({"response_type": "info", "answer": "hello"})
+    assert stream(monkeypatch, reply) == [("info", [], "hello")]
+
+
+def test_stream_empty_reply(monkeypatch):
+    assert stream(monkeypatch, "") == [
+        (
+            "error",
+            [],
+            "No response generated. Please try rewording your question.",
+        )
+    ]
@@ -1,15 +1,46 @@
 import os
+import asyncio
 import json
+import logging
+import queue
 import re
-from typing import Dict, List, Optional
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
 from dataclasses import dataclass
 import google.generativeai as genai
 from dotenv import load_dotenv
 
+try:
+    # Several times faster than json.loads; its errors subclass json.JSONDecodeError
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Patterns used by InsightGenerator.clean_and_parse
+_RE_JSON_FENCE = re.compile(r"```json\s*|\s*```")
+_RE_PLUS_CONCAT = re.compile(r'"\s*\+\s*"')
+_RE_COMMA_WORD = re.compile(r",(?=\w)")
+_RE_BACKSLASH_SPACE = re.compile(r"\\\s")
+_RE_SQL_KW = re.compile(r"\b(SELECT|FROM|WHERE|GROUP BY|ORDER BY|JOIN|ON)\b(?!\s)")
+_RE_WS = re.compile(r"\s+")
+_RE_SEMI = re.compile(r"\s*;\s*")
+_CTRL_TABLE = str.maketrans("", "", "".join(map(chr, range(0x20))) + "\x7f")
+_RE_NUM_QUOTE = re.compile(r'(?<=\d)"(?=,)')
+_RE_MULTI_COMMA = re.compile(r",,+")
+_RE_TRAIL_COMMA = re.compile(r",\s*}")
+
 
-@dataclass
+@dataclass(slots=True)
 class Insight:
     insight: str
     business_value: str
@@ -18,7 +49,7 @@ class Insight:
     metrics: List[str]
 
 
-@dataclass
+@dataclass(slots=True)
 class AnalysisResponse:
     response_type: str
     insights: Optional[List[Insight]] = None
@@ -28,142 +59,321 @@ class AnalysisResponse:
 class PromptTemplate:
     """Handles prompt generation and formatting."""
 
+    # Passed to the model as its system instruction instead of being built into each
+    # query prompt; the API still sends it with every request
+    SYSTEM_PROMPT = """You are an expert business intelligence analyst. Each request \
+gives the available tables and their columns as METADATA and the user's question as \
+QUERY. Reply with JSON only.
+
+If the user asks what insights are available, study the tables and their relationships \
+and suggest exactly one concrete, actionable insight. Do not ask for query refinement \
+or say the question is too general. Reply with:
+{"response_type": "info", "answer": "Based on the available data, I can provide \
+insights about: [insight]"}
+
+Otherwise generate specific insights with SQL queries for bar charts only:
+{"response_type": "analysis", "insights": [{"insight": "What we're looking for", \
+"business_value": "1-2 sentences on why this matters", "sql_query": "SQL query with \
+well-defined X and Y columns", "visualization": "bar_chart", "metrics": ["X_column", \
+"Y_column"]}]}
+
+SQL rules:
+- Qualify every column reference as table_name.column_name and alias it to its simple \
+name in the final SELECT, e.g. table_name.column_name AS column_name
+- metrics hold the simple column names, never table_name.column_name
+- Only reference columns listed in METADATA and join tables on their shared keys
+- Put each SQL clause on its own line and use single quotes for string literals
+"""
+
     @staticmethod
     def get_analysis_prompt(query: str, metadata_str: str) -> str:
-        return f"""
-        You are an expert business intelligence analyst. Analyze the following:
-        
-        USER QUERY: {query}
-        
-        AVAILABLE DATA:
-        Tables and their columns:
-        {metadata_str}
-        
-        TASK:
-        1. For general questions about available insights:
-           - Analyze the table structure and relationships
-           - Suggest exactly one concrete, specific insight that could be generated
-           - Focus on business value and actionable information
-           - DO NOT ask for query refinement or say the question is too general
-           
-        2. For specific analysis questions:
-           - Generate specific insights with SQL queries for bar chart only
-           - Include business value and visualization suggestions specific
-        
-        OUTPUT FORMAT:
-        If asking about available insights:
-        {{
-            "response_type": "info",
-            "answer": "Based on the available data, I can provide insights about: [Insight possibility]"
-        }}
-        
-        If asking for specific analysis:
-        {{
-            "response_type": "analysis",
-            "insights": [
-                {{
-                    "insight": "Clear description of what we're looking for",
-                    "business_value": "1-2 sentence explanation of why this matters",
-                    "sql_query": "Optimized SQL query with properly defined X and Y columns",
-                    "visualization": "bar_chart",
-                    "metrics": ["X_column", "Y_column"]
-                }}
-            ]
-        }}
-        
-        SQL REQUIREMENTS:
-        - Use simple column names in the final SELECT statement without table prefixes
-        - Format SQL queries as: 
-          SELECT 
-              table_name.column_name AS column_name
-          FROM...
-        - Ensure metrics array contains simple column names without table prefixes
-        - Format metrics as ["column_name", "column_name"] not ["table_name.column_name"]
-        - Always use fully qualified column names to avoid ambiguity (e.g., table_name.column_name)
-        - Format SQL queries with proper spacing and line breaks
-        - Each SQL clause should be on a new line
-        - Use single quotes for string literals in SQL
-        - Ensure all column references exist in the provided metadata
-        - Use appropriate joins when combining tables based on their relationships
-        - Ensure the SQL query has well-defined columns suitable for bar charts, line charts, and heatmaps
-        - Validate column names before generating SQL queries.
-
-        
-        EXAMPLES:
-        If user asks "What insights can you provide?", and metadata includes:
-        {{
-            "orders": ["order_id", "customer_id", "order_date", "total_amount"],
-            "customers": ["customer_id", "customer_name", "region"]
-        }}
-        
-        Respond with:
-        {{
-            "response_type": "info",
-            "answer": "Based on the available data, I can provide insights about: 1) Customer purchasing trends over time (line_chart), 2) Regional revenue distribution (bar_chart), 3) Order frequency heatmap by date and region (heatmap)."
-        }}
-        
-        Now, analyze the following query:
-        {query}
-        """
+        return f"METADATA:\n{metadata_str}\nQUERY: {query}"
+
+
+@lru_cache(maxsize=32)
+def _serialize_metadata(frozen: tuple) -> str:
+    """Serializes table metadata frozen as ((table, (columns...)), ...) pairs."""
+    return json.dumps(dict(frozen), separators=(",", ":"))
+
+
+def _metadata_json(table_metadata: Dict[str, list]) -> str:
+    """Returns the cached JSON rendering of the table metadata."""
+    return _serialize_metadata(
+        tuple((table, tuple(columns)) for table, columns in table_metadata.items())
+    )
+
+
+class ReplyCache:
+    """Bounded LRU of complete Gemini replies, safe to share across sessions.
+
+    Entries expire ttl seconds after they are stored.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._replies: "OrderedDict[Tuple[str, str], Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str]) -> Optional[str]:
+        with self._lock:
+            entry = self._replies.get(key)
+            if entry is None:
+                return None
+            expires, reply = entry
+            if expires <= time.monotonic():
+                del self._replies[key]
+                return None
+            self._replies.move_to_end(key)
+            return reply
+
+    def put(self, key: Tuple[str, str], reply: str):
+        with self._lock:
+            self._replies[key] = (time.monotonic() + self.ttl, reply)
+            self._replies.move_to_end(key)
+            if len(self._replies) > self.maxsize:
+                self._replies.popitem(last=False)
+
+
+class _InsightScanner:
+    """Finds insight objects in a streamed reply as soon as each one closes.
+
+    Insights are the objects directly inside the top-level array, i.e.
+    {"insights": [{...}, {...}]}. Brace depth is tracked across chunks and
+    braces inside string literals are ignored. `complete` turns True once the
+    top-level document has closed, with `end` marking where it closed in the
+    last chunk fed; anything after that is ignored.
+
+    Only a reply whose first non-whitespace character opens the document,
+    optionally after a ```json fence, is scanned. Anything else is prose, whose
+    brackets mean nothing, so it yields no insights and never completes.
+    """
+
+    _FENCE = "```json"
+
+    def __init__(self):
+        self._opened = False
+        self._prose = False
+        self._fence = 0
+        self._stack = []
+        self._in_string = False
+        self._escaped = False
+        self._current = None
+        self.complete = False
+        self.end = 0
+
+    def feed(self, text: str) -> List[str]:
+        """Consumes a chunk and returns the insight objects it completed."""
+        completed = []
+        if self.complete or self._prose:
+            return completed
+        for i, ch in enumerate(text):
+            if not self._opened:
+                # Whitespace and the fence may only come before the opening bracket,
+                # and the fence must not be cut short
+                at_edge = self._fence in (0, len(self._FENCE))
+                if ch in "{[" and at_edge:
+                    self._opened = True
+                elif ch.isspace() and at_edge:
+                    continue
+                elif self._fence < len(self._FENCE) and ch == self._FENCE[self._fence]:
+                    self._fence += 1
+                    continue
+                else:
+                    self._prose = True
+                    return completed
+            if self._current is not None:
+                self._current.append(ch)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if ch == "{" and self._stack == ["{", "["]:
+                    self._current = [ch]
+                self._stack.append(ch)
+            elif ch in "}]" and self._stack:
+                self._stack.pop()
+                if self._current is not None and self._stack == ["{", "["]:
+                    completed.append("".join(self._current))
+                    self._current = None
+                elif not self._stack:
+                    self.complete = True
+                    self.end = i + 1
+                    break
+        return completed
+
+
+class _ReplyReader:
+    """Tracks one Gemini reply for both the sync and the async chunk readers.
+
+    feed() scans each chunk as it arrives and trims it where the JSON document
+    closes. finish() caches the complete reply unless it does not parse into a
+    usable response.
+    """
+
+    def __init__(self, cache: ReplyCache, key: Tuple[str, str]):
+        self.cache = cache
+        self.key = key
+        self.cached = cache.get(key)
+        self._scanner = _InsightScanner()
+        self._chunks = []
+
+    @property
+    def complete(self) -> bool:
+        return self._scanner.complete
+
+    def feed(self, text: str) -> Tuple[str, List[str]]:
+        """Returns the chunk, trimmed if it closed the document, and its insights."""
+        insight_texts = self._scanner.feed(text)
+        if self._scanner.complete:
+            text = text[: self._scanner.end]
+        self._chunks.append(text)
+        return text, insight_texts
+
+    def finish(self):
+        reply = "".join(self._chunks)
+        try:
+            response = InsightGenerator.parse_response(reply) if reply else None
+        except Exception:
+            response = None
+        if response is not None and response.response_type != "error":
+            self.cache.put(self.key, reply)
 
 
 class InsightGenerator:
-    def __init__(self, model_name="gemini-pro"):
+    def __init__(self, model_name="gemini-1.5-pro"):
         genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-        self.model = genai.GenerativeModel(model_name)
+        self.model = genai.GenerativeModel(
+            model_name,
+            system_instruction=PromptTemplate.SYSTEM_PROMPT,
+            # Asks for bare JSON so replies usually skip the cleanup passes
+            generation_config={"response_mime_type": "application/json"},
+        )
+        self.reply_cache = ReplyCache()
+
+    def _reply_chunks(
+        self, query: str, metadata_str: str
+    ) -> Iterator[Tuple[str, List[str]]]:
+        """Streams Gemini's reply as (chunk, insight objects completed by it) pairs.
+
+        When the reply opens with a JSON document, reading stops as soon as it closes,
+        so trailing fences and whitespace are never waited on. Completed replies are
+        cached.
+        """
+        reader = _ReplyReader(self.reply_cache, (query, metadata_str))
+        if reader.cached is not None:
+            yield reader.feed(reader.cached)
+            return
+
+        prompt = PromptTemplate.get_analysis_prompt(query, metadata_str)
+        for chunk in self.model.generate_content(prompt, stream=True):
+            yield reader.feed(chunk.text)
+            if reader.complete:
+                break
+
+        reader.finish()
+
+    async def _reply_chunks_async(
+        self, query: str, metadata_str: str
+    ) -> AsyncIterator[Tuple[str, List[str]]]:
+        """Async counterpart of _reply_chunks, backed by generate_content_async."""
+        reader = _ReplyReader(self.reply_cache, (query, metadata_str))
+        if reader.cached is not None:
+            yield reader.feed(reader.cached)
+            return
+
+        prompt = PromptTemplate.get_analysis_prompt(query, metadata_str)
+        response = await self.model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            yield reader.feed(chunk.text)
+            if reader.complete:
+                break
+
+        reader.finish()
+
+    @staticmethod
+    def clean_and_parse(response_text: str) -> Any:
+        """Cleans AI response by removing markdown formatting and fixing escape characters,
+        then parses it. Raises json.JSONDecodeError, whose .doc holds the cleaned text,
+        if the response is still not valid JSON."""
+        # Skip the cleanup entirely when the response is already valid JSON. Text that
+        # does not end in } or ] cannot be a complete document, so it is not tried
+        stripped = response_text.strip()
+        if stripped[-1:] in ("}", "]"):
+            try:
+                return _json_loads(stripped)
+            except json.JSONDecodeError:
+                pass
+
+        # Passes below whose trigger character is absent are skipped, so the text
+        # is only rescanned for rewrites that can actually apply
+        cleaned_text = response_text
 
-    def clean_response(self, response_text: str) -> str:
-        """Cleans AI response by removing markdown formatting and fixing escape characters."""
         # Remove JSON markdown
-        cleaned_text = re.sub(r"```json\s*|\s*```", "", response_text)
+        if "```" in cleaned_text:
+            cleaned_text = _RE_JSON_FENCE.sub("", cleaned_text)
 
         # Fix SQL query concatenation by removing " + " and adding proper spacing
-        cleaned_text = re.sub(r'"\s*\+\s*"', " ", cleaned_text)
+        if "+" in cleaned_text:
+            cleaned_text = _RE_PLUS_CONCAT.sub(" ", cleaned_text)
 
         # Add spaces after commas in SQL queries
-        cleaned_text = re.sub(r",(?=\w)", ", ", cleaned_text)
+        if "," in cleaned_text:
+            cleaned_text = _RE_COMMA_WORD.sub(", ", cleaned_text)
 
-        cleaned_text = re.sub(
-            r"\\\s", " ", cleaned_text
-        )  # Remove backslash before spaces
+        # Remove backslash before spaces
+        if "\\" in cleaned_text:
+            cleaned_text = _RE_BACKSLASH_SPACE.sub(" ", cleaned_text)
 
-        # Fix spacing around SQL keywords
-        sql_keywords = ["SELECT", "FROM", "WHERE",
-                        "GROUP BY", "ORDER BY", "JOIN", "ON"]
-        for keyword in sql_keywords:
-            cleaned_text = re.sub(
-                rf"\b{keyword}\b(?!\s)", f"{keyword} ", cleaned_text)
+        # Fix spacing around SQL keywords in a single pass
+        cleaned_text = _RE_SQL_KW.sub(lambda m: m.group(1) + " ", cleaned_text)
 
         # Remove excessive whitespace while preserving SQL formatting
-        cleaned_text = re.sub(r"\s+", " ", cleaned_text)
-        cleaned_text = re.sub(r"\s*;\s*", ";", cleaned_text)
+        cleaned_text = _RE_WS.sub(" ", cleaned_text)
+        if ";" in cleaned_text:
+            cleaned_text = _RE_SEMI.sub(";", cleaned_text)
 
         # Clean up any remaining invalid JSON characters
-        cleaned_text = re.sub(r"[\x00-\x1F\x7F]", "", cleaned_text)
+        cleaned_text = cleaned_text.translate(_CTRL_TABLE)
 
-        try:
-            # Validate JSON structure
-            json.loads(cleaned_text)
-            return cleaned_text
-        except json.JSONDecodeError as e:
-            print(f"Debug - JSON parsing error: {str(e)}")
-            print(f"Debug - Cleaned text causing error: {cleaned_text}")
+        if cleaned_text.rstrip()[-1:] in ("}", "]"):
+            try:
+                return _json_loads(cleaned_text)
+            except json.JSONDecodeError as e:
+                logger.debug("JSON parsing error: %s", e)
+
+        logger.debug("Cleaned text causing error: %s", cleaned_text)
 
-            # Additional fix attempt for common JSON formatting issues
-            # Remove quotes after numbers
-            cleaned_text = re.sub(r'(?<=\d)"(?=,)', "", cleaned_text)
-            # Fix multiple commas
-            cleaned_text = re.sub(r",,+", ",", cleaned_text)
-            # Remove trailing commas
-            cleaned_text = re.sub(r",\s*}", "}", cleaned_text)
+        # Additional fix attempt for common JSON formatting issues
+        # Remove quotes after numbers
+        cleaned_text = _RE_NUM_QUOTE.sub("", cleaned_text)
+        # Fix multiple commas
+        cleaned_text = _RE_MULTI_COMMA.sub(",", cleaned_text)
+        # Remove trailing commas
+        cleaned_text = _RE_TRAIL_COMMA.sub("}", cleaned_text)
 
-            return cleaned_text
+        return _json_loads(cleaned_text)
 
-    def parse_response(self, cleaned_response: str) -> AnalysisResponse:
-        """Parses the cleaned response into structured format."""
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def parse_response(response_text: str) -> AnalysisResponse:
+        """Parses the AI response into structured format.
+
+        Results are memoized per reply text and shared, so callers must not mutate them.
+        """
         try:
-            # First try to parse as JSON
-            response_dict = json.loads(cleaned_response)
+            response_dict = InsightGenerator.clean_and_parse(response_text)
+            if not isinstance(response_dict, dict):
+                return AnalysisResponse(
+                    response_type="error",
+                    answer="Failed to parse response: expected a JSON object",
+                )
 
             if response_dict.get("response_type") == "info":
                 return AnalysisResponse(
@@ -183,49 +393,173 @@ class InsightGenerator:
 
         except json.JSONDecodeError as e:
             # If the response is a plain text error message, return it directly
-            if "unable to generate" in cleaned_response.lower():
-                return AnalysisResponse(response_type="error", answer=cleaned_response)
+            if "unable to generate" in e.doc.lower():
+                return AnalysisResponse(response_type="error", answer=e.doc)
             # Otherwise return the parsing error
             return AnalysisResponse(
                 response_type="error", answer=f"Failed to parse response: {str(e)}"
             )
 
     def generate_insights(
-        self, query: str, table_metadata: Dict[str, list]
+        self,
+        query: str,
+        table_metadata: Dict[str, list],
+        metadata_str: Optional[str] = None,
     ) -> AnalysisResponse:
-        """Processes user query and returns structured insights."""
-        metadata_str = json.dumps(table_metadata, indent=2)
-        prompt = PromptTemplate.get_analysis_prompt(query, metadata_str)
+        """Processes user query and returns structured insights.
+
+        metadata_str may carry the pre-rendered table_metadata to skip re-serializing it.
+        """
+        if metadata_str is None:
+            metadata_str = _metadata_json(table_metadata)
 
         try:
-            response = self.model.generate_content(prompt)
-            print(response)
-            if not response.text:
-                return AnalysisResponse(
+            response_text = "".join(
+                chunk for chunk, _ in self._reply_chunks(query, metadata_str)
+            )
+            return self._response_from_reply(response_text)
+
+        except Exception as e:
+            return AnalysisResponse(
+                response_type="error", answer=f"Error generating insights: {str(e)}"
+            )
+
+    async def generate_insights_async(
+        self,
+        query: str,
+        table_metadata: Dict[str, list],
+        metadata_str: Optional[str] = None,
+    ) -> AnalysisResponse:
+        """Async variant of generate_insights, so concurrent chats share one event loop."""
+        if metadata_str is None:
+            metadata_str = _metadata_json(table_metadata)
+
+        try:
+            chunks = [
+                chunk
+                async for chunk, _ in self._reply_chunks_async(query, metadata_str)
+            ]
+            return self._response_from_reply("".join(chunks))
+
+        except Exception as e:
+            return AnalysisResponse(
+                response_type="error", answer=f"Error generating insights: {str(e)}"
+            )
+
+    def _response_from_reply(self, response_text: str) -> AnalysisResponse:
+        """Parses a complete reply, reporting an empty one as an error."""
+        logger.debug("Gemini reply: %s", response_text)
+        if not response_text:
+            return AnalysisResponse(
+                response_type="error",
+                answer="No response generated. Please try rewording your question.",
+            )
+
+        return self.parse_response(response_text)
+
+    def stream_insights(
+        self, query: str, table_metadata: Dict[str, list]
+    ) -> Iterator[AnalysisResponse]:
+        """Processes user query and yields insights as soon as Gemini streams them.
+
+        Insights are yielded as soon as the chunk that completes them arrives, together
+        with any others that chunk completed. Once the reply ends, it is parsed in full
+        to pick up info/error responses and any insights that could not be parsed
+        early.
+        """
+        metadata_str = _metadata_json(table_metadata)
+        chunks = []
+        streamed = 0
+        incremental = True
+
+        try:
+            for chunk, insight_texts in self._reply_chunks(query, metadata_str):
+                chunks.append(chunk)
+                if not incremental:
+                    continue
+                insights = []
+                for insight_text in insight_texts:
+                    try:
+                        insights.append(Insight(**self.clean_and_parse(insight_text)))
+                    except (json.JSONDecodeError, TypeError):
+                        # Leave this and later insights to the full parse below
+                        incremental = False
+                        break
+                if insights:
+                    streamed += len(insights)
+                    yield AnalysisResponse(response_type="analysis", insights=insights)
+
+            response_text = "".join(chunks)
+            logger.debug("Gemini reply: %s", response_text)
+            if not response_text:
+                yield AnalysisResponse(
                     response_type="error",
                     answer="No response generated. Please try rewording your question.",
                 )
+                return
 
-            cleaned_response = self.clean_response(response.text)
-            return self.parse_response(cleaned_response)
+            response = self.parse_response(response_text)
 
         except Exception as e:
-            return AnalysisResponse(
+            yield AnalysisResponse(
                 response_type="error", answer=f"Error generating insights: {str(e)}"
             )
+            return
+
+        if response.response_type == "analysis":
+            remaining = (response.insights or [])[streamed:]
+            if remaining or not streamed:
+                yield AnalysisResponse(response_type="analysis", insights=remaining)
+        elif not streamed:
+            yield response
+
+
+async def _console_input(prompt: str) -> str:
+    """Reads a console line without blocking the event loop.
+
+    The read runs in a daemon thread, so Ctrl-C ends the session at once instead of
+    waiting on a worker stuck in input().
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def resolve(line, error):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(line)
+
+    def read():
+        try:
+            line, error = input(prompt), None
+        except Exception as e:
+            line, error = None, e
+        try:
+            loop.call_soon_threadsafe(resolve, line, error)
+        except RuntimeError:
+            # The loop already closed, e.g. after an interrupt
+            pass
+
+    threading.Thread(target=read, daemon=True).start()
+    return await future
 
 
 class ChatInterface:
+    _ANALYSIS_HEADER = "🔹 AI-generated insights & queries:\n"
+    _INSIGHT_FMT = (
+        "\n Insight: {0}\n Business Value: {1}\n Visualization: {2}\n"
+        " Key Metrics: {3}\n SQL:\n{4}\n"
+    )
+
     def __init__(self, generator: InsightGenerator, table_metadata: Dict[str, list]):
         self.generator = generator
         self.table_metadata = table_metadata
+        # The metadata is fixed for the session, so render it once
+        self.metadata_str = _metadata_json(table_metadata)
         self.chat_history = []
         self.exit_commands = ["exit", "quit", "bye"]
-        self.response_formatters = {
-            "info": self._format_info_response,
-            "analysis": self._format_analysis_response,
-            "error": self._format_error_response,
-        }
 
     def _format_info_response(self, response: AnalysisResponse) -> str:
         """Format informational responses"""
@@ -233,58 +567,114 @@ class ChatInterface:
 
     def _format_analysis_response(self, response: AnalysisResponse) -> str:
         """Format analysis responses with insights"""
-        output = "🔹 AI-generated insights & queries:\n"
+        parts = [self._ANALYSIS_HEADER]
         for insight in response.insights or []:
-            output += self._format_insight(insight)
-        return output
+            parts.append(self._format_insight(insight))
+        return "".join(parts)
 
     def _format_insight(self, insight: Insight) -> str:
         """Format a single insight"""
-        return "\n".join(
-            [
-                f"\n Insight: {insight.insight}",
-                f" Business Value: {insight.business_value}",
-                f" Visualization: {insight.visualization}",
-                f" Key Metrics: {', '.join(insight.metrics)}",
-                f" SQL:\n{insight.sql_query}\n",
-            ]
+        return self._INSIGHT_FMT.format(
+            insight.insight,
+            insight.business_value,
+            insight.visualization,
+            ", ".join(insight.metrics),
+            insight.sql_query,
         )
 
     def _format_error_response(self, response: AnalysisResponse) -> str:
         """Format error responses"""
         return f"❌ Error: {response.answer}\n"
 
+    # Shared by all instances; the entries are plain functions, so format_response
+    # passes self explicitly
+    response_formatters = {
+        "info": _format_info_response,
+        "analysis": _format_analysis_response,
+        "error": _format_error_response,
+    }
+
     def format_response(self, response: AnalysisResponse) -> str:
         """Format response based on type"""
         formatter = self.response_formatters.get(
-            response.response_type, self._format_error_response
+            response.response_type, ChatInterface._format_error_response
         )
-        return formatter(response)
+        return formatter(self, response)
 
     def save_to_history(self, user_input: str, response: AnalysisResponse):
         """Save interaction to chat history"""
         self.chat_history.append(
-            {"timestamp": pd.Timestamp.now(), "user": user_input, "ai": response}
+            {"timestamp": datetime.now(), "user": user_input, "ai": response}
         )
 
     def start_chat(self):
         """Run interactive chat session"""
+        asyncio.run(self._chat_loop())
+
+    async def _chat_loop(self):
+        """Chat loop driven on a single event loop"""
         print("\n🔹 Business Insight Chatbot – Ask me about your data!")
         print(f"Type {', '.join(self.exit_commands)} to end the session.\n")
 
         while True:
-            user_input = input("👤 You: ").strip().lower()
+            user_input = (await _console_input("👤 You: ")).strip().lower()
             if user_input in self.exit_commands:
                 print("👋 Exiting chat. Have a great day!")
                 break
 
-            response = self.generator.generate_insights(
-                user_input, self.table_metadata)
+            response = await self.generator.generate_insights_async(
+                user_input, self.table_metadata, self.metadata_str
+            )
             formatted_response = self.format_response(response)
             print(formatted_response)
             self.save_to_history(user_input, response)
 
 
+class ReadPool:
+    """Fixed-size pool of read-only SQLite connections for concurrent queries.
+
+    With in_memory=True the database file is copied once into a shared-cache
+    in-memory database, so queries never touch the disk.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        size: int,
+        pragmas: Iterable[str] = (),
+        in_memory: bool = False,
+    ):
+        self._connections = queue.Queue(maxsize=size)
+        uri = f"file:{db_path}?mode=ro"
+        self._keeper = None
+        if in_memory:
+            # The in-memory copy lives as long as at least one connection is open
+            memory_uri = f"file:{db_path}?mode=memory&cache=shared"
+            self._keeper = sqlite3.connect(
+                memory_uri, uri=True, check_same_thread=False
+            )
+            with closing(sqlite3.connect(uri, uri=True)) as disk:
+                disk.backup(self._keeper)
+            uri = memory_uri
+
+        for _ in range(size):
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            if in_memory:
+                conn.execute("PRAGMA query_only=ON")
+            for pragma in pragmas:
+                conn.execute(f"PRAGMA {pragma}")
+            self._connections.put(conn)
+
+    @contextmanager
+    def acquire(self) -> Iterator[sqlite3.Connection]:
+        """Checks out a connection, blocking until one is free."""
+        conn = self._connections.get()
+        try:
+            yield conn
+        finally:
+            self._connections.put(conn)
+
+
 # Sample usage
 if __name__ == "__main__":
     # Sample table metadata